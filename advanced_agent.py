@@ -5,43 +5,164 @@ Based on Docker's compose-for-agents examples
 """
 
 import os
+import re
 import json
+import asyncio
+import itertools
+import collections
+import time
+import orjson
 import requests
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime
 
+from conversation import ConversationSummary
+from llm_cache import LLMCache
+from llm_client import JSON_HEADERS, create_http_session, max_tokens_for
+
+TOOL_CALL_START = re.compile(r"\s*\{")
+TOOL_CALL_SCAN_LIMIT = 512
+TOOL_CALL_END = "</tool>"  # stop sequence that ends decoding right after a tool call
+# Start of the final answer in a raw gpt-oss completion, with or without special tokens
+FINAL_CHANNEL_MARKER = re.compile(r"^(?:.*<\|channel\|>final<\|message\|>|(?:analysis.*)?assistantfinal)", re.S)
+JSON_DECODER = json.JSONDecoder()
+
+# Tool catalogs shared by every MCPToolManager in the process, keyed by gateway URL
+_TOOL_CACHE: Dict[str, Dict[str, Any]] = {}
+_TOOL_CACHE_TS: Dict[str, float] = {}
+TOOL_CACHE_TTL = 60
+
 
 @dataclass
 class AgentConfig:
     """Enhanced configuration for multi-agent systems"""
     model_url: str = "http://localhost:12434/engines/llama.cpp/v1"
+    model_urls: List[str] = field(default_factory=list)  # model server replicas; defaults to [model_url]
     model_name: str = "ai/gpt-oss-20b"
     mcp_gateway_url: str = "http://localhost:3000"
     reasoning_level: str = "medium"
-    max_tokens: int = 2000
+    max_tokens: int = 2000  # upper bound; each request's budget follows its reasoning level
     temperature: float = 0.7
+    max_concurrency: int = 8  # match the model server's parallel slots
+    rate_limit_rpm: Optional[int] = None  # requests per minute cap for hosted endpoints
+    cache_responses: bool = False  # cache even when temperature > 0
+    cache_ttl: int = 3600
+    redis_url: Optional[str] = None  # share the cache across processes
+    native_tool_calls: bool = False  # use the server's tools/tool_calls API (e.g. llama.cpp --jinja)
+    reuse_prompt_prefix: bool = True  # post-tool calls extend the first prompt so the KV cache is reused
+
+
+class AsyncRateLimiter:
+    """Token bucket allowing `rate` requests per `period` seconds"""
+    
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> None:
+        """Wait until a request may be sent"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+
+class ToolCallStreamParser:
+    """Accumulates a streamed chat completion, stopping at a complete tool call"""
+    
+    def __init__(self):
+        self.text = ""
+        self._maybe_tool_call = True
+    
+    def feed(self, line: str) -> bool:
+        """Consume one server-sent event line; return True once generation can stop"""
+        if not line.startswith("data: "):
+            return False
+        data = line[len("data: "):].strip()
+        if data == "[DONE]":
+            return True
+        
+        choices = orjson.loads(data).get("choices") or [{}]
+        delta = (choices[0].get("delta") or {}).get("content")
+        if not delta:
+            return False
+        self.text += delta
+        
+        if self._maybe_tool_call and "}" in delta:
+            tool_call = self._complete_tool_call()
+            if tool_call is not None:
+                self.text = tool_call
+                return True
+        return False
+    
+    def _complete_tool_call(self) -> Optional[str]:
+        """Return the tool call JSON if the text so far starts with a complete one"""
+        start = len(self.text) - len(self.text.lstrip())
+        if not self.text.startswith("{", start):
+            self._maybe_tool_call = start == len(self.text)
+            return None
+        try:
+            action_data, end = JSON_DECODER.raw_decode(self.text, start)
+        except ValueError:
+            return None  # Object not finished yet
+        
+        self._maybe_tool_call = False
+        if isinstance(action_data, dict) and action_data.get("action") == "use_tool":
+            return self.text[start:end]
+        return None
 
 
 class MCPToolManager:
     """Manager for Model Context Protocol tools"""
     
-    def __init__(self, gateway_url: str):
+    def __init__(self, gateway_url: str, session: Optional[requests.Session] = None, discover: bool = True):
         self.gateway_url = gateway_url
+        self.session = session or create_http_session()
         self.available_tools = {}
-        self._discover_tools()
+        if discover:
+            self._discover_tools()
     
-    def _discover_tools(self):
-        """Discover available MCP tools from gateway"""
+    def _discover_tools(self) -> Dict[str, Any]:
+        """Discover available MCP tools from gateway, reusing a recent catalog"""
+        cached_at = _TOOL_CACHE_TS.get(self.gateway_url)
+        if cached_at is not None and time.monotonic() - cached_at < TOOL_CACHE_TTL:
+            self.available_tools = _TOOL_CACHE[self.gateway_url]
+            return self.available_tools
+        
         try:
-            response = requests.get(f"{self.gateway_url}/tools")
+            response = self.session.get(f"{self.gateway_url}/tools")
             if response.status_code == 200:
-                self.available_tools = response.json()
+                self.available_tools = orjson.loads(response.content)
+                _TOOL_CACHE[self.gateway_url] = self.available_tools
+                _TOOL_CACHE_TS[self.gateway_url] = time.monotonic()
                 print(f"✅ Discovered {len(self.available_tools)} MCP tools")
             else:
                 print("⚠️ No MCP tools available")
         except Exception as e:
             print(f"❌ Failed to connect to MCP gateway: {e}")
+        return self.available_tools
+    
+    @classmethod
+    def invalidate(cls, gateway_url: Optional[str] = None) -> None:
+        """Drop the cached tool catalog for one gateway, or for all of them"""
+        if gateway_url is None:
+            _TOOL_CACHE.clear()
+            _TOOL_CACHE_TS.clear()
+        else:
+            _TOOL_CACHE.pop(gateway_url, None)
+            _TOOL_CACHE_TS.pop(gateway_url, None)
     
     def call_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Call an MCP tool through the gateway"""
@@ -50,28 +171,74 @@ class MCPToolManager:
                 "tool": tool_name,
                 "parameters": parameters
             }
-            response = requests.post(f"{self.gateway_url}/call", json=payload)
-            return response.json()
+            response = self.session.post(
+                f"{self.gateway_url}/call",
+                data=orjson.dumps(payload),
+                headers=JSON_HEADERS
+            )
+            return orjson.loads(response.content)
+        except Exception as e:
+            return {"error": f"Tool call failed: {e}"}
+    
+    async def call_tool_async(self, tool_name: str, parameters: Dict[str, Any],
+                              client: httpx.AsyncClient) -> Dict[str, Any]:
+        """Call an MCP tool through the gateway using a shared async client"""
+        try:
+            payload = {
+                "tool": tool_name,
+                "parameters": parameters
+            }
+            response = await client.post(
+                f"{self.gateway_url}/call",
+                content=orjson.dumps(payload),
+                headers=JSON_HEADERS
+            )
+            return orjson.loads(response.content)
         except Exception as e:
             return {"error": f"Tool call failed: {e}"}
     
     def get_tool_description(self, tool_name: str) -> str:
         """Get description of a specific tool"""
         return self.available_tools.get(tool_name, {}).get("description", "No description available")
+    
+    def get_tool_schema(self, tool_name: str) -> Dict[str, Any]:
+        """Get the JSON Schema for a tool's parameters"""
+        tool = self.available_tools.get(tool_name, {})
+        for key in ("inputSchema", "input_schema", "parameters"):
+            if isinstance(tool.get(key), dict):
+                return tool[key]
+        return {"type": "object", "properties": {}}
 
 
 class CrewAgent:
     """Individual agent in a crew with specific role and capabilities"""
     
-    def __init__(self, role: str, goal: str, backstory: str, tools: List[str] = None):
+    def __init__(self, role: str, goal: str, backstory: str, tools: List[str] = None,
+                 max_history: int = 12):
         self.role = role
         self.goal = goal
         self.backstory = backstory
         self.tools = tools or []
-        self.conversation_history = []
+        self.conversation_history = collections.deque(maxlen=max_history)
+        self.history_summary = ConversationSummary()  # Turns evicted from the deque
+        self._system_message: Optional[Dict[str, str]] = None
+        self._system_message_key: Optional[tuple] = None
+        self.get_system_message()  # Build the prompt once, up front
     
     def get_system_prompt(self) -> str:
         """Generate system prompt based on agent's role and capabilities"""
+        return self.get_system_message()["content"]
+    
+    def get_system_message(self) -> Dict[str, str]:
+        """System message for this agent, rebuilt only when its profile changes"""
+        key = (self.role, self.goal, self.backstory, tuple(self.tools))
+        if key != self._system_message_key:
+            self._system_message = {"role": "system", "content": self._build_system_prompt()}
+            self._system_message_key = key
+        return self._system_message
+    
+    def _build_system_prompt(self) -> str:
+        """Render the system prompt from role, goal, backstory and tools"""
         tools_desc = f"Available tools: {', '.join(self.tools)}" if self.tools else "No tools available"
         
         return f"""You are a {self.role}.
@@ -82,8 +249,8 @@ Backstory: {self.backstory}
 
 {tools_desc}
 
-When using tools, respond with JSON in this format:
-{{"action": "use_tool", "tool": "tool_name", "parameters": {{"param": "value"}}}}
+When using tools, respond with JSON in this format, followed by {TOOL_CALL_END}:
+{{"action": "use_tool", "tool": "tool_name", "parameters": {{"param": "value"}}}}{TOOL_CALL_END}
 
 Otherwise, respond normally to help achieve your goal."""
 
@@ -93,50 +260,427 @@ class MultiAgentSystem:
     
     def __init__(self, config: Optional[AgentConfig] = None):
         self.config = config or AgentConfig()
-        self.mcp_manager = MCPToolManager(self.config.mcp_gateway_url)
+        self.session = create_http_session()
+        # The tool manager gets its own session: _bootstrap discovers tools and
+        # probes the model server from separate threads, and requests.Session
+        # is not thread-safe
+        self.mcp_manager = MCPToolManager(self.config.mcp_gateway_url, discover=False)
         self.agents = {}
         self.task_results = []
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._llm_semaphore: Optional[asyncio.Semaphore] = None
+        self._llm_batch_lock: Optional[asyncio.Lock] = None
+        self._rate_limiter: Optional[AsyncRateLimiter] = None
+        self._supports_prompt_batch: Optional[bool] = None
+        self._skeleton: Dict[str, Any] = {}
+        self._skeleton_key: Optional[tuple] = None
+        self.cache = LLMCache(ttl=self.config.cache_ttl, redis_url=self.config.redis_url)
+        self.model_endpoints = list(self.config.model_urls) or [self.config.model_url]
+        self._outstanding = {url: 0 for url in self.model_endpoints}
+        self._endpoint_offsets = itertools.cycle(range(len(self.model_endpoints)))
+        self.model_ok = False
+        self._bootstrap()
+    
+    def _bootstrap(self) -> None:
+        """Discover MCP tools and probe the model server concurrently"""
+        with ThreadPoolExecutor(2) as executor:
+            tools_future = executor.submit(self.mcp_manager._discover_tools)
+            model_future = executor.submit(self._probe_model)
+            tools_future.result()
+            self.model_ok = model_future.result()
+    
+    def _probe_model(self) -> bool:
+        """Check the model servers, opening keep-alive connections before the first task"""
+        model_ok = False
+        for model_url in self.model_endpoints:
+            try:
+                response = self.session.get(f"{model_url}/models", timeout=5)
+                if response.status_code == 200:
+                    model_ok = True
+                    continue
+                print(f"⚠️ Model server {model_url} not responding")
+            except requests.RequestException as e:
+                print(f"❌ Failed to connect to model server {model_url}: {e}")
+        return model_ok
+    
+    def _pick_endpoint(self) -> str:
+        """Pick the model endpoint with the fewest outstanding requests, round-robin on ties"""
+        offset = next(self._endpoint_offsets)
+        rotated = self.model_endpoints[offset:] + self.model_endpoints[:offset]
+        return min(rotated, key=self._outstanding.__getitem__)
+    
+    @contextmanager
+    def _acquire_endpoint(self) -> Iterator[str]:
+        """Reserve a model endpoint for the duration of one request"""
+        model_url = self._pick_endpoint()
+        self._outstanding[model_url] += 1
+        try:
+            yield model_url
+        finally:
+            self._outstanding[model_url] -= 1
         
     def add_agent(self, name: str, agent: CrewAgent) -> None:
         """Add an agent to the crew"""
         self.agents[name] = agent
         print(f"➕ Added agent: {name} ({agent.role})")
     
-    def _make_llm_request(self, messages: List[Dict], agent_name: str = None) -> str:
-        """Make request to the LLM model"""
-        payload = {
-            "model": self.config.model_name,
-            "messages": messages,
-            "max_tokens": self.config.max_tokens,
-            "temperature": self.config.temperature
-        }
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Get the shared async HTTP client, creating it on first use.
         
-        try:
-            response = requests.post(
-                f"{self.config.model_url}/chat/completions",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=60
+        HTTP/2 is negotiated with TLS endpoints so concurrent workflow steps
+        are multiplexed over a single connection; plain http:// model
+        servers keep using pooled HTTP/1.1 connections.
+        """
+        if self._aclient is None:
+            limits = httpx.Limits(
+                max_connections=max(32, self.config.max_concurrency),
+                max_keepalive_connections=max(32, self.config.max_concurrency)
             )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            self._aclient = httpx.AsyncClient(http2=True, timeout=60, limits=limits)
+        return self._aclient
+    
+    async def aclose(self) -> None:
+        """Close the shared async HTTP client"""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+        self._llm_semaphore = None
+        self._llm_batch_lock = None
+        self._rate_limiter = None
+    
+    @asynccontextmanager
+    async def _llm_slot(self, count: int = 1) -> AsyncIterator[None]:
+        """Bound concurrent LLM requests and apply the optional rate limit.
+        
+        count is the number of server slots the request fills, e.g. the
+        prompts in a batched /completions call; at most config.max_concurrency.
+        The semaphore and rate limiter are created on first use so they belong
+        to the running event loop and are released with the async client in
+        aclose.
+        """
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.config.max_concurrency)
+            self._llm_batch_lock = asyncio.Lock()
+            if self.config.rate_limit_rpm:
+                self._rate_limiter = AsyncRateLimiter(self.config.rate_limit_rpm)
+        
+        semaphore = self._llm_semaphore
+        acquired = 0
+        try:
+            if count == 1:
+                await semaphore.acquire()
+                acquired = 1
+            else:
+                # One multi-permit request at a time, so two batches can never
+                # each hold part of the permits and wait on the other
+                async with self._llm_batch_lock:
+                    while acquired < count:
+                        await semaphore.acquire()
+                        acquired += 1
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire()
+            yield
+        finally:
+            for _ in range(acquired):
+                semaphore.release()
+    
+    def _payload_skeleton(self) -> Dict[str, Any]:
+        """Fixed request fields, rebuilt only when the config fields they use change.
+        
+        Keyed on the live config values, so in-place edits such as
+        config.temperature = 0 are picked up. Callers copy it, never mutate it.
+        """
+        config = self.config
+        key = (config.model_name, config.reasoning_level, config.max_tokens, config.temperature)
+        if key != self._skeleton_key:
+            self._skeleton = {
+                "model": config.model_name,
+                "max_tokens": max_tokens_for(config.reasoning_level, config.max_tokens),
+                "temperature": config.temperature
+            }
+            self._skeleton_key = key
+        return self._skeleton
+    
+    def _build_llm_payload(self, messages: List[Dict], reasoning_level: Optional[str] = None,
+                           stop: Optional[List[str]] = None,
+                           tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Build the chat completion payload for the LLM"""
+        payload = {**self._payload_skeleton(), "messages": messages}
+        if reasoning_level:
+            payload["max_tokens"] = max_tokens_for(reasoning_level, self.config.max_tokens)
+        if stop:
+            payload["stop"] = stop
+        if tools:
+            payload["tools"] = tools
+            payload["tool_choice"] = "auto"
+        return payload
+    
+    def _tool_specs(self, agent: CrewAgent) -> Optional[List[Dict]]:
+        """Function-calling tool definitions for the agent, if native tool calls are enabled"""
+        if not self.config.native_tool_calls or not agent.tools:
+            return None
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool,
+                    "description": self.mcp_manager.get_tool_description(tool),
+                    "parameters": self.mcp_manager.get_tool_schema(tool)
+                }
+            }
+            for tool in agent.tools
+        ]
+    
+    @staticmethod
+    def _message_content(message: Dict[str, Any]) -> str:
+        """Text of a chat completion message, with a native tool call rendered as our tool JSON.
+        
+        The raw tool call is kept under "tool_call" so the follow-up request
+        can echo it back with a matching tool result message.
+        """
+        tool_calls = message.get("tool_calls")
+        if tool_calls:
+            function = tool_calls[0]["function"]
+            arguments = function.get("arguments") or "{}"
+            return orjson.dumps({
+                "action": "use_tool",
+                "tool": function["name"],
+                "parameters": orjson.loads(arguments) if isinstance(arguments, str) else arguments,
+                "tool_call": tool_calls[0]
+            }).decode()
+        return message.get("content") or ""
+    
+    def _make_llm_request(self, messages: List[Dict], agent_name: str = None, stream: bool = False,
+                          reasoning_level: Optional[str] = None, stop: Optional[List[str]] = None,
+                          tools: Optional[List[Dict]] = None) -> str:
+        """Make request to the LLM model.
+        
+        With stream=True the completion is read incrementally and the
+        connection is closed as soon as a complete tool call JSON arrives.
+        reasoning_level overrides the config level for the max_tokens budget
+        and stop lists sequences that end generation. tools enables native
+        function calling; a returned tool call comes back as our tool JSON.
+        """
+        payload = self._build_llm_payload(messages, reasoning_level, stop, tools)
+        cache_key = LLMCache.key_for_payload(payload, self.config.cache_responses)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            with self._acquire_endpoint() as model_url, self.session.post(
+                f"{model_url}/chat/completions",
+                data=orjson.dumps({**payload, "stream": True} if stream else payload),
+                headers=JSON_HEADERS,
+                timeout=60,
+                stream=stream
+            ) as response:
+                response.raise_for_status()
+                if stream:
+                    # SSE responses carry no charset, which requests would read as ISO-8859-1
+                    response.encoding = "utf-8"
+                    parser = ToolCallStreamParser()
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line and parser.feed(line):
+                            break
+                    content = parser.text
+                else:
+                    content = self._message_content(orjson.loads(response.content)["choices"][0]["message"])
         except Exception as e:
             return f"Error: {e}"
+        
+        if cache_key:
+            self.cache.set(cache_key, content)
+        return content
     
-    def execute_agent_task(self, agent_name: str, task: str, context: str = "") -> str:
-        """Execute a task with a specific agent"""
-        if agent_name not in self.agents:
-            return f"Agent {agent_name} not found"
+    async def _make_llm_request_async(self, messages: List[Dict], agent_name: str = None, stream: bool = False,
+                                      reasoning_level: Optional[str] = None, stop: Optional[List[str]] = None,
+                                      tools: Optional[List[Dict]] = None) -> str:
+        """Make a non-blocking request to the LLM model (see _make_llm_request)"""
+        payload = self._build_llm_payload(messages, reasoning_level, stop, tools)
+        cache_key = LLMCache.key_for_payload(payload, self.config.cache_responses)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        agent = self.agents[agent_name]
+        try:
+            async with self._llm_slot():
+                with self._acquire_endpoint() as model_url:
+                    if stream:
+                        async with self._get_async_client().stream(
+                            "POST",
+                            f"{model_url}/chat/completions",
+                            content=orjson.dumps({**payload, "stream": True}),
+                            headers=JSON_HEADERS
+                        ) as response:
+                            response.raise_for_status()
+                            parser = ToolCallStreamParser()
+                            async for line in response.aiter_lines():
+                                if line and parser.feed(line):
+                                    break
+                            content = parser.text
+                    else:
+                        response = await self._get_async_client().post(
+                            f"{model_url}/chat/completions",
+                            content=orjson.dumps(payload),
+                            headers=JSON_HEADERS
+                        )
+                        response.raise_for_status()
+                        content = self._message_content(orjson.loads(response.content)["choices"][0]["message"])
+        except Exception as e:
+            return f"Error: {e}"
         
-        # Build context for the agent
-        messages = [
-            {"role": "system", "content": agent.get_system_prompt()},
+        if cache_key:
+            self.cache.set(cache_key, content)
+        return content
+    
+    def _render_chat(self, messages: List[Dict]) -> str:
+        """Render chat messages as a raw gpt-oss (harmony format) prompt.
+        
+        Mirrors the gpt-oss chat template: the reasoning level goes in the
+        system header, system prompts become developer instructions, and the
+        prompt ends at the assistant header so the model still starts with
+        its analysis channel.
+        """
+        instructions = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        parts = [
+            f"<|start|>system<|message|>Reasoning: {self.config.reasoning_level}\n\n"
+            "# Valid channels: analysis, commentary, final. "
+            "Channel must be included for every message.<|end|>"
         ]
+        if instructions:
+            parts.append(f"<|start|>developer<|message|># Instructions\n\n{instructions}<|end|>")
+        for message in messages:
+            if message["role"] == "user":
+                parts.append(f"<|start|>user<|message|>{message['content']}<|end|>")
+            elif message["role"] == "assistant":
+                parts.append(f"<|start|>assistant<|channel|>final<|message|>{message['content']}<|end|>")
+        parts.append("<|start|>assistant")
+        return "".join(parts)
+    
+    @staticmethod
+    def _final_channel_text(text: str) -> Optional[str]:
+        """Extract the final-channel answer from a raw harmony completion.
+        
+        Handles both completions that keep the special tokens and ones where
+        the server stripped them ("analysis...assistantfinal..."). Returns
+        None if no final channel can be found.
+        """
+        match = FINAL_CHANNEL_MARKER.search(text)
+        if match is None:
+            return None
+        text = text[match.end():]
+        for terminator in ("<|return|>", "<|end|>"):
+            text = text.split(terminator, 1)[0]
+        return text
+    
+    @staticmethod
+    def _completion_texts(body: Any, count: int) -> List[str]:
+        """Texts from a batched /completions response, in prompt order.
+        
+        llama.cpp returns a JSON array with one completion object per
+        prompt; vLLM returns one object with indexed choices.
+        """
+        if isinstance(body, list):
+            texts = [item["choices"][0]["text"] for item in body]
+        else:
+            choices = sorted(body["choices"], key=lambda choice: choice["index"])
+            texts = [choice["text"] for choice in choices]
+        if len(texts) != count:
+            raise ValueError(f"Expected {count} completions, got {len(texts)}")
+        return texts
+    
+    async def _probe_prompt_batching(self) -> bool:
+        """Check once whether the backend accepts a list of prompts on /completions.
+        
+        Only gpt-oss models are batched this way, since prompts are rendered
+        in the harmony format client-side.
+        """
+        if self._supports_prompt_batch is None:
+            self._supports_prompt_batch = False
+            if "gpt-oss" not in self.config.model_name.lower():
+                return False
+            try:
+                response = await self._get_async_client().get(f"{self.model_endpoints[0]}/models")
+                response.raise_for_status()
+                owners = {model.get("owned_by") for model in orjson.loads(response.content).get("data", [])}
+                self._supports_prompt_batch = bool(owners & {"llamacpp", "vllm"})
+            except Exception:
+                pass  # Unknown backend, fall back to concurrent chat requests
+        return self._supports_prompt_batch
+    
+    async def _complete_prompts(self, batches: List[List[Dict]], stop: Optional[List[str]] = None) -> List[Optional[str]]:
+        """Send message lists as one batched /completions request.
+        
+        Takes one concurrency slot per prompt, since each fills a server slot.
+        Returns the final-channel answers, None where none was found.
+        """
+        payload = {
+            **self._payload_skeleton(),
+            "prompt": [self._render_chat(messages) for messages in batches],
+            "skip_special_tokens": False  # keep the channel markers in the text (vLLM)
+        }
+        if stop:
+            payload["stop"] = stop
+        async with self._llm_slot(len(batches)):
+            with self._acquire_endpoint() as model_url:
+                response = await self._get_async_client().post(
+                    f"{model_url}/completions",
+                    content=orjson.dumps(payload),
+                    headers=JSON_HEADERS
+                )
+        response.raise_for_status()
+        texts = self._completion_texts(orjson.loads(response.content), len(batches))
+        return [self._final_channel_text(text) for text in texts]
+    
+    async def _make_llm_request_batch(self, batches: List[List[Dict]], stop: Optional[List[str]] = None,
+                                      tools: Optional[List[Dict]] = None) -> List[str]:
+        """Get responses for several independent message lists at once.
         
-        # Add conversation history
-        messages.extend(agent.conversation_history[-6:])  # Keep recent context
+        For gpt-oss on llama.cpp and vLLM backends the prompts go in batched
+        /completions requests of at most config.max_concurrency prompts so
+        the scheduler can batch them. Otherwise, with native tool calls, or
+        if a batched request fails, each message list gets its own chat
+        completion request, bounded by config.max_concurrency.
+        """
+        if len(batches) > 1 and not tools and await self._probe_prompt_batching():
+            size = self.config.max_concurrency
+            try:
+                chunks = await asyncio.gather(*[
+                    self._complete_prompts(batches[start:start + size], stop)
+                    for start in range(0, len(batches), size)
+                ])
+            except Exception as e:
+                print(f"⚠️ Batched completion failed, sending requests individually: {e}")
+            else:
+                # Never return the analysis channel: redo prompts without a final answer
+                finals = [final for chunk in chunks for final in chunk]
+                missing = [i for i, final in enumerate(finals) if final is None]
+                retried = await asyncio.gather(*[
+                    self._make_llm_request_async(batches[i], stop=stop) for i in missing
+                ])
+                for i, content in zip(missing, retried):
+                    finals[i] = content
+                return finals
+        
+        # Each request waits for its own slot in _make_llm_request_async
+        return list(await asyncio.gather(*[
+            self._make_llm_request_async(messages, stop=stop, tools=tools) for messages in batches
+        ]))
+    
+    def _build_task_messages(self, agent: CrewAgent, task: str, context: str = "") -> Tuple[List[Dict], str]:
+        """Build the message list and task prompt for an agent task"""
+        messages = [agent.get_system_message()]
+        
+        # Summarize older turns, then add recent conversation history
+        history = list(agent.conversation_history)
+        # Sent as a user message: the gpt-oss template drops any system message after the first
+        summary = agent.history_summary.merged(history[:-6]).render()
+        if summary:
+            messages.append({"role": "user", "content": summary})
+        messages.extend(history[-6:])  # Keep recent context
         
         # Add current task with context
         task_prompt = f"Task: {task}"
@@ -144,63 +688,262 @@ class MultiAgentSystem:
             task_prompt += f"\n\nContext from previous agents: {context}"
         
         messages.append({"role": "user", "content": task_prompt})
+        return messages, task_prompt
+    
+    @staticmethod
+    def _parse_tool_call(response: str) -> Optional[Dict[str, Any]]:
+        """Return the tool call requested by the agent, if any"""
+        # Cheap checks first so plain-text replies never reach the JSON parser.
+        # Tool call JSON always starts the response, so the markers are near the top.
+        if not TOOL_CALL_START.match(response):
+            return None
+        head = response[:TOOL_CALL_SCAN_LIMIT]
+        if '"action"' not in head or '"use_tool"' not in head:
+            return None
         
-        # Get response from LLM
-        response = self._make_llm_request(messages, agent_name)
-        
-        # Check if agent wants to use a tool
         try:
-            if response.strip().startswith('{') and 'action' in response:
-                action_data = json.loads(response)
-                if action_data.get("action") == "use_tool":
-                    tool_name = action_data.get("tool")
-                    parameters = action_data.get("parameters", {})
-                    
-                    # Execute tool via MCP
-                    tool_result = self.mcp_manager.call_tool(tool_name, parameters)
-                    
-                    # Get final response incorporating tool result
-                    tool_context = f"Tool {tool_name} returned: {tool_result}"
-                    messages.append({"role": "assistant", "content": response})
-                    messages.append({"role": "user", "content": f"Tool result: {tool_context}. Please provide your final response."})
-                    
-                    response = self._make_llm_request(messages, agent_name)
-        except json.JSONDecodeError:
-            pass  # Not a tool call, continue with normal response
-        
-        # Update agent's conversation history
+            action_data = orjson.loads(response)
+        except orjson.JSONDecodeError:
+            # Tolerate text after the object, e.g. an unstripped stop sequence
+            try:
+                action_data, _ = JSON_DECODER.raw_decode(response.lstrip())
+            except ValueError:
+                return None  # Not a tool call, continue with normal response
+        if isinstance(action_data, dict) and action_data.get("action") == "use_tool":
+            return action_data
+        return None
+    
+    def _tool_followup_messages(self, messages: List[Dict], task_prompt: str, response: str,
+                                action_data: Dict[str, Any], tool_result: Any) -> List[Dict]:
+        """Build the context for the final response after a tool call.
+        
+        With config.reuse_prompt_prefix the first call's messages are sent
+        unchanged with the tool exchange appended, so a server with prompt
+        caching only prefills the new tokens. Otherwise only the system
+        prompt, the current task, the tool call and its result are sent to
+        keep the follow-up prefill short on servers without a prompt cache.
+        A native tool call is answered with the assistant's tool_calls
+        message and a matching role "tool" result.
+        """
+        tool_call = action_data.get("tool_call")
+        if tool_call:
+            tool_exchange = [
+                {"role": "assistant", "content": None, "tool_calls": [tool_call]},
+                {"role": "tool", "tool_call_id": tool_call.get("id"), "content": orjson.dumps(tool_result).decode()}
+            ]
+        else:
+            tool_context = f"Tool {action_data.get('tool')} returned: {tool_result}"
+            tool_exchange = [
+                {"role": "assistant", "content": response},
+                {"role": "user", "content": f"Tool result: {tool_context}. Please provide your final response."}
+            ]
+        if self.config.reuse_prompt_prefix:
+            return messages + tool_exchange
+        return [messages[0], {"role": "user", "content": task_prompt}] + tool_exchange
+    
+    @staticmethod
+    def _record_turn(agent: CrewAgent, task_prompt: str, response: str, tool_name: Optional[str] = None) -> None:
+        """Update agent's conversation history"""
+        # History keeps only the final answer, so note the tool for the summary here
+        if tool_name:
+            agent.history_summary.tools.add(tool_name)
+        # Fold turns the bounded deque is about to evict into the running summary
+        history = agent.conversation_history
+        if history.maxlen is not None and len(history) + 2 > history.maxlen:
+            agent.history_summary.add(list(history)[:len(history) + 2 - history.maxlen])
         agent.conversation_history.append({"role": "user", "content": task_prompt})
         agent.conversation_history.append({"role": "assistant", "content": response})
+    
+    def execute_agent_task(self, agent_name: str, task: str, context: str = "") -> str:
+        """Execute a task with a specific agent"""
+        if agent_name not in self.agents:
+            return f"Agent {agent_name} not found"
+        
+        agent = self.agents[agent_name]
+        messages, task_prompt = self._build_task_messages(agent, task, context)
+        
+        # Get response from LLM, stopping early if it is a tool call
+        tools = self._tool_specs(agent)
+        response = self._make_llm_request(
+            messages, agent_name, stream=tools is None, stop=[TOOL_CALL_END], tools=tools
+        )
         
+        # Check if agent wants to use a tool
+        action_data = self._parse_tool_call(response)
+        tool_name = None
+        if action_data:
+            tool_name = action_data.get("tool")
+            parameters = action_data.get("parameters", {})
+            
+            # Execute tool via MCP
+            tool_result = self.mcp_manager.call_tool(tool_name, parameters)
+            
+            # Get final response incorporating tool result (same tool specs so the
+            # prompt prefix still matches). This is the step's deliverable, so it
+            # keeps the task's reasoning level and token budget.
+            followup_messages = self._tool_followup_messages(messages, task_prompt, response, action_data, tool_result)
+            response = self._make_llm_request(followup_messages, agent_name, tools=tools)
+        
+        self._record_turn(agent, task_prompt, response, tool_name)
         return response
     
-    def execute_crew_workflow(self, workflow: List[Dict[str, str]]) -> Dict[str, Any]:
-        """Execute a multi-agent workflow"""
-        results = {}
-        context = ""
+    async def execute_agent_task_async(self, agent_name: str, task: str, context: str = "") -> str:
+        """Execute a task with a specific agent without blocking the event loop"""
+        if agent_name not in self.agents:
+            return f"Agent {agent_name} not found"
         
-        print(f"\n🚀 Starting crew workflow with {len(workflow)} tasks")
-        print("=" * 60)
+        agent = self.agents[agent_name]
+        messages, task_prompt = self._build_task_messages(agent, task, context)
         
-        for i, step in enumerate(workflow, 1):
-            agent_name = step["agent"]
-            task = step["task"]
+        # Get response from LLM, stopping early if it is a tool call
+        tools = self._tool_specs(agent)
+        response = await self._make_llm_request_async(
+            messages, agent_name, stream=tools is None, stop=[TOOL_CALL_END], tools=tools
+        )
+        return await self._finish_agent_task_async(agent_name, messages, task_prompt, response)
+    
+    async def _finish_agent_task_async(self, agent_name: str, messages: List[Dict], task_prompt: str, response: str) -> str:
+        """Run any requested tool and record the agent's turn"""
+        agent = self.agents[agent_name]
+        
+        # Check if agent wants to use a tool
+        action_data = self._parse_tool_call(response)
+        tool_name = None
+        if action_data:
+            tool_name = action_data.get("tool")
+            parameters = action_data.get("parameters", {})
             
-            print(f"\n📋 Step {i}: {agent_name}")
-            print(f"Task: {task}")
-            print("-" * 40)
+            # Execute tool via MCP
+            tool_result = await self.mcp_manager.call_tool_async(
+                tool_name, parameters, self._get_async_client()
+            )
             
-            result = self.execute_agent_task(agent_name, task, context)
-            results[f"step_{i}_{agent_name}"] = {
-                "task": task,
-                "result": result,
-                "timestamp": datetime.now().isoformat()
-            }
+            # Get final response incorporating tool result (same tool specs so the
+            # prompt prefix still matches). This is the step's deliverable, so it
+            # keeps the task's reasoning level and token budget.
+            followup_messages = self._tool_followup_messages(messages, task_prompt, response, action_data, tool_result)
+            response = await self._make_llm_request_async(
+                followup_messages, agent_name, tools=self._tool_specs(agent)
+            )
+        
+        self._record_turn(agent, task_prompt, response, tool_name)
+        return response
+    
+    async def _execute_agent_tasks_batch(self, agent_name: str, tasks: List[Tuple[str, str]]) -> List[str]:
+        """Execute several (task, context) pairs with one agent as a single batch"""
+        if agent_name not in self.agents:
+            return [f"Agent {agent_name} not found"] * len(tasks)
+        
+        agent = self.agents[agent_name]
+        prepared = [self._build_task_messages(agent, task, context) for task, context in tasks]
+        responses = await self._make_llm_request_batch(
+            [messages for messages, _ in prepared], stop=[TOOL_CALL_END], tools=self._tool_specs(agent)
+        )
+        
+        return list(await asyncio.gather(*[
+            self._finish_agent_task_async(agent_name, messages, task_prompt, response)
+            for (messages, task_prompt), response in zip(prepared, responses)
+        ]))
+    
+    async def _execute_wave(self, workflow: List[Dict[str, Any]], wave: List[int], contexts: List[str]) -> List[str]:
+        """Execute one wave, batching steps that share an agent"""
+        by_agent: Dict[str, List[int]] = {}
+        for position, i in enumerate(wave):
+            by_agent.setdefault(workflow[i]["agent"], []).append(position)
+        
+        async def run_group(agent_name: str, positions: List[int]) -> List[str]:
+            if len(positions) == 1:
+                position = positions[0]
+                task = workflow[wave[position]]["task"]
+                return [await self.execute_agent_task_async(agent_name, task, contexts[position])]
+            tasks = [(workflow[wave[position]]["task"], contexts[position]) for position in positions]
+            return await self._execute_agent_tasks_batch(agent_name, tasks)
+        
+        group_results = await asyncio.gather(*[
+            run_group(agent_name, positions) for agent_name, positions in by_agent.items()
+        ])
+        
+        wave_results = [""] * len(wave)
+        for positions, results in zip(by_agent.values(), group_results):
+            for position, result in zip(positions, results):
+                wave_results[position] = result
+        return wave_results
+    
+    @staticmethod
+    def _plan_waves(workflow: List[Dict[str, Any]]) -> Tuple[List[List[int]], List[List[int]]]:
+        """Group workflow steps into waves of independent steps.
+        
+        Each step may name itself with an optional ``id`` (defaults to the
+        agent name) and list the ids it needs in ``depends_on``. A step
+        without ``depends_on`` depends on every earlier step, so plain
+        workflows keep running one step at a time.
+        
+        Returns the waves (lists of step indices) and each step's dependencies.
+        """
+        step_ids: Dict[str, int] = {}
+        dependencies: List[List[int]] = []
+        levels: List[int] = []
+        
+        for i, step in enumerate(workflow):
+            if "depends_on" in step:
+                deps = []
+                for dep in step["depends_on"]:
+                    if dep not in step_ids:
+                        raise ValueError(f"Step {i + 1} depends on unknown or later step '{dep}'")
+                    deps.append(step_ids[dep])
+                deps = sorted(set(deps))
+            else:
+                deps = list(range(i))
             
-            print(f"✅ Result: {result[:200]}{'...' if len(result) > 200 else ''}")
+            dependencies.append(deps)
+            levels.append(1 + max((levels[d] for d in deps), default=-1))
+            step_ids[step.get("id", step["agent"])] = i
+        
+        waves: List[List[int]] = [[] for _ in range(max(levels, default=-1) + 1)]
+        for i, level in enumerate(levels):
+            waves[level].append(i)
+        return waves, dependencies
+    
+    async def execute_crew_workflow_async(self, workflow: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Execute a multi-agent workflow, running independent steps concurrently"""
+        waves, dependencies = self._plan_waves(workflow)
+        step_results: Dict[int, str] = {}
+        step_entries: Dict[int, Dict[str, str]] = {}
+        
+        print(f"\n🚀 Starting crew workflow with {len(workflow)} tasks in {len(waves)} waves")
+        print("=" * 60)
+        
+        for wave in waves:
+            contexts = []
+            for i in wave:
+                step = workflow[i]
+                print(f"\n📋 Step {i + 1}: {step['agent']}")
+                print(f"Task: {step['task']}")
+                print("-" * 40)
+                
+                # Pass results of the steps this one depends on as context
+                contexts.append("".join(
+                    f"\n{workflow[d]['agent']} completed: {step_results[d]}\n"
+                    for d in dependencies[i]
+                ))
+            
+            wave_results = await self._execute_wave(workflow, wave, contexts)
             
-            # Pass result as context to next agent
-            context += f"\n{agent_name} completed: {result}\n"
+            for i, result in zip(wave, wave_results):
+                step = workflow[i]
+                step_results[i] = result
+                step_entries[i] = {
+                    "task": step["task"],
+                    "result": result,
+                    "timestamp": datetime.now().isoformat()
+                }
+                print(f"✅ Step {i + 1} result: {result[:200]}{'...' if len(result) > 200 else ''}")
+        
+        # Report results in workflow order
+        results = {
+            f"step_{i + 1}_{step['agent']}": step_entries[i]
+            for i, step in enumerate(workflow)
+        }
         
         self.task_results.append({
             "workflow": workflow,
@@ -209,6 +952,17 @@ class MultiAgentSystem:
         })
         
         return results
+    
+    async def _run_crew_workflow(self, workflow: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run a workflow and release the async client bound to this event loop"""
+        try:
+            return await self.execute_crew_workflow_async(workflow)
+        finally:
+            await self.aclose()
+    
+    def execute_crew_workflow(self, workflow: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Execute a multi-agent workflow"""
+        return asyncio.run(self._run_crew_workflow(workflow))
 
 
 def create_research_crew() -> MultiAgentSystem:
@@ -252,6 +1006,12 @@ def main():
     
     # Create research crew
     crew = create_research_crew()
+    if not crew.model_ok:
+        print("\n📋 Setup Instructions:")
+        print("1. Enable Docker Model Runner in Docker Desktop")
+        print(f"2. Run: docker model pull {crew.config.model_name}")
+        print("3. Wait for the model to download (may take a while)")
+        return
     
     # Define a research workflow
     research_topic = input("\n📝 Enter research topic: ").strip() or "AI agent development trends"
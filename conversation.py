@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Conversation history helpers shared by the simple and multi-agent examples
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+TOOL_NAME_PATTERN = re.compile(r'"tool"\s*:\s*"([^"]+)"')
+MAX_SUMMARY_TOPICS = 5
+MAX_TOPIC_LENGTH = 60
+
+
+@dataclass
+class ConversationSummary:
+    """Running, deterministic summary of messages dropped from the context window"""
+    message_count: int = 0
+    topics: List[str] = field(default_factory=list)
+    tools: Set[str] = field(default_factory=set)
+
+    def add(self, messages: List[Dict[str, str]]) -> "ConversationSummary":
+        """Fold more dropped messages into the summary"""
+        for message in messages:
+            content = message.get("content") or ""
+            if message.get("role") == "user":
+                first_line = content.strip().split("\n", 1)[0]
+                if first_line.startswith("Task: "):
+                    first_line = first_line[len("Task: "):]
+                if first_line:
+                    self.topics.append(first_line[:MAX_TOPIC_LENGTH])
+            elif message.get("role") == "assistant":
+                self.tools.update(TOOL_NAME_PATTERN.findall(content))
+
+        self.message_count += len(messages)
+        del self.topics[:-MAX_SUMMARY_TOPICS]
+        return self
+
+    def merged(self, messages: List[Dict[str, str]]) -> "ConversationSummary":
+        """Copy of the summary with more messages folded in"""
+        summary = ConversationSummary(self.message_count, list(self.topics), set(self.tools))
+        return summary.add(messages)
+
+    def render(self) -> Optional[str]:
+        """One-line summary message content, or None if nothing was dropped"""
+        if not self.message_count:
+            return None
+        topics_desc = " | ".join(self.topics) or "none"
+        tools_desc = ", ".join(sorted(self.tools)) or "none"
+        return (
+            f"[Summary of earlier conversation: {self.message_count} messages; "
+            f"user topics: {topics_desc}; tool calls: {tools_desc}]"
+        )
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Response cache for deterministic LLM calls
+Shared by the simple and multi-agent examples
+"""
+
+import time
+import hashlib
+import orjson
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class LLMCache:
+    """LRU + TTL cache for LLM responses, optionally backed by Redis"""
+
+    def __init__(self, maxsize: int = 10_000, ttl: int = 3600, redis_url: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._redis = None
+
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(redis_url)
+            except ImportError:
+                print("⚠️ redis package not installed, using in-process cache only")
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """Stable hash of every request field that can change the response"""
+        normalized = orjson.dumps(
+            {field: value for field, value in payload.items() if field != "stream"},
+            option=orjson.OPT_SORT_KEYS
+        )
+        return hashlib.blake2b(normalized).hexdigest()
+
+    @classmethod
+    def key_for_payload(cls, payload: Dict[str, Any], cache_responses: bool = False) -> Optional[str]:
+        """Cache key for a chat payload, or None if its response should not be cached"""
+        if payload["temperature"] != 0 and not cache_responses:
+            return None
+        return cls.make_key(payload)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(f"llm:{key}")
+            except Exception as e:
+                print(f"⚠️ Redis cache lookup failed: {e}")
+                return None
+            if raw is not None:
+                value = orjson.loads(raw)
+                self._store_local(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Cache a JSON-serializable value"""
+        self._store_local(key, value)
+        if self._redis is not None:
+            try:
+                self._redis.setex(f"llm:{key}", self.ttl, orjson.dumps(value))
+            except Exception as e:
+                print(f"⚠️ Redis cache store failed: {e}")
+
+    def clear(self) -> None:
+        """Drop all in-process entries"""
+        self._entries.clear()
+
+    def _store_local(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
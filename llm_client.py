@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+HTTP and request helpers for the model server
+Shared by the simple and multi-agent examples
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Generation budget per reasoning level, capped by config.max_tokens
+MAX_TOKENS_BY_LEVEL = {"low": 256, "medium": 768, "high": 2048}
+
+
+def create_http_session() -> requests.Session:
+    """Create a keep-alive HTTP session with a pooled, retrying adapter"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def max_tokens_for(reasoning_level: str, max_tokens: int) -> int:
+    """Generation budget for a reasoning level, never above max_tokens"""
+    return min(max_tokens, MAX_TOKENS_BY_LEVEL.get(reasoning_level, max_tokens))
@@ -6,19 +6,50 @@ Author: Ajeet Singh Raina
 
 import os
 import json
+import functools
+import collections
+import orjson
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 
+from conversation import ConversationSummary
+from llm_cache import LLMCache
+from llm_client import JSON_HEADERS, create_http_session, max_tokens_for
+
 
 @dataclass
 class AgentConfig:
     """Configuration for the AI Agent"""
     model_url: str = "http://localhost:12434/engines/llama.cpp/v1"
     model_name: str = "ai/gpt-oss"
-    max_tokens: int = 1000
+    max_tokens: int = 1000  # upper bound; each request's budget follows its reasoning level
     temperature: float = 0.7
     reasoning_level: str = "medium"  # low, medium, high
+    cache_responses: bool = False  # cache even when temperature > 0
+    cache_ttl: int = 3600
+    redis_url: Optional[str] = None  # share the cache across processes
+    history_high_water: int = 64  # trim history once it grows past this
+    history_low_water: int = 32  # number of recent messages kept after a trim
+
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful AI assistant."
+
+
+@functools.lru_cache(maxsize=32)
+def _build_system_msg(system_prompt: Optional[str]) -> Tuple[Tuple[str, str], ...]:
+    """Format the system message once per prompt.
+    
+    The reasoning level is sent in a separate message so the system message
+    stays byte-identical across turns and llama.cpp can reuse its prompt cache.
+    """
+    return (("role", "system"), ("content", system_prompt or DEFAULT_SYSTEM_PROMPT))
+
+
+@functools.lru_cache(maxsize=8)
+def _build_reasoning_msg(reasoning_level: str) -> Tuple[Tuple[str, str], ...]:
+    """Format the message that sets the reasoning level"""
+    return (("role", "user"), ("content", f"Reasoning: {reasoning_level}"))
 
 
 class GPTOSSAgent:
@@ -26,83 +57,117 @@ class GPTOSSAgent:
     
     def __init__(self, config: Optional[AgentConfig] = None):
         self.config = config or AgentConfig()
-        self.conversation_history = []
+        self.conversation_history = collections.deque()
+        self.history_summary: Optional[str] = None
+        self._dropped_summary = ConversationSummary()
+        self._skeleton: Dict[str, Any] = {}
+        self._skeleton_key: Optional[tuple] = None
+        self.session = create_http_session()
+        self.cache = LLMCache(ttl=self.config.cache_ttl, redis_url=self.config.redis_url)
+        self._prewarm()
+    
+    def _prewarm(self):
+        """Open the keep-alive connection to the model before the first turn"""
+        try:
+            self.session.head(f"{self.config.model_url}/models", timeout=5)
+        except requests.RequestException:
+            pass  # The first request will report connection problems
+    
+    def _payload_skeleton(self) -> Dict[str, Any]:
+        """Fixed request fields, rebuilt only when the config fields they use change.
         
-    def _make_request(self, messages: list) -> Dict[str, Any]:
+        Keyed on the live config values, so in-place edits such as
+        config.temperature = 0 are picked up. Callers copy it, never mutate it.
+        """
+        config = self.config
+        key = (config.model_name, config.reasoning_level, config.max_tokens, config.temperature)
+        if key != self._skeleton_key:
+            self._skeleton = {
+                "model": config.model_name,
+                "max_tokens": max_tokens_for(config.reasoning_level, config.max_tokens),
+                "temperature": config.temperature,
+                "stream": False
+            }
+            self._skeleton_key = key
+        return self._skeleton
+    
+    def _make_request(self, messages: list, reasoning_level: Optional[str] = None) -> Dict[str, Any]:
         """Make a request to the local GPT-OSS-20B model"""
-        payload = {
-            "model": self.config.model_name,
-            "messages": messages,
-            "max_tokens": self.config.max_tokens,
-            "temperature": self.config.temperature,
-            "stream": False
-        }
+        payload = {**self._payload_skeleton(), "messages": messages}
+        if reasoning_level:
+            payload["max_tokens"] = max_tokens_for(reasoning_level, self.config.max_tokens)
+        
+        cache_key = LLMCache.key_for_payload(payload, self.config.cache_responses)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.config.model_url}/chat/completions",
-                json=payload,
-                headers={"Content-Type": "application/json"},
+                data=orjson.dumps(payload),
+                headers=JSON_HEADERS,
                 timeout=30
             )
             response.raise_for_status()
-            return response.json()
+            result = orjson.loads(response.content)
         except requests.RequestException as e:
             raise Exception(f"Error communicating with model: {e}")
+        
+        if cache_key:
+            self.cache.set(cache_key, result)
+        return result
     
-    def chat(self, user_input: str, system_prompt: Optional[str] = None) -> str:
+    def chat(self, user_input: str, system_prompt: Optional[str] = None,
+             reasoning_level: Optional[str] = None) -> str:
         """Chat with the AI agent"""
-        messages = []
+        # Add system prompt, then reasoning level
+        level = reasoning_level or self.config.reasoning_level
+        messages = [
+            dict(_build_system_msg(system_prompt)),
+            dict(_build_reasoning_msg(level))
+        ]
         
-        # Add system prompt with reasoning level
-        if system_prompt:
-            messages.append({
-                "role": "system", 
-                "content": f"{system_prompt}\nReasoning: {self.config.reasoning_level}"
-            })
-        else:
-            messages.append({
-                "role": "system",
-                "content": f"You are a helpful AI assistant. Reasoning: {self.config.reasoning_level}"
-            })
-        
-        # Add conversation history
+        # Add summary of trimmed turns, then conversation history. The summary is a
+        # user message: the gpt-oss template drops any system message after the first.
+        if self.history_summary:
+            messages.append({"role": "user", "content": self.history_summary})
         messages.extend(self.conversation_history)
         
         # Add current user input
         messages.append({"role": "user", "content": user_input})
         
         # Get response from model
-        response = self._make_request(messages)
+        response = self._make_request(messages, reasoning_level=level)
         assistant_response = response["choices"][0]["message"]["content"]
         
         # Update conversation history
         self.conversation_history.append({"role": "user", "content": user_input})
         self.conversation_history.append({"role": "assistant", "content": assistant_response})
         
-        # Keep conversation history manageable
-        if len(self.conversation_history) > 10:
-            self.conversation_history = self.conversation_history[-10:]
+        # Keep conversation history manageable. Trimming in large chunks keeps
+        # the prompt prefix unchanged between trims so the server's KV cache
+        # can be reused instead of re-processing the whole history each turn.
+        if len(self.conversation_history) > self.config.history_high_water:
+            excess = len(self.conversation_history) - self.config.history_low_water
+            dropped = [self.conversation_history.popleft() for _ in range(excess)]
+            self.history_summary = self._dropped_summary.add(dropped).render()
         
         return assistant_response
     
     def think(self, task: str, reasoning_level: str = "high") -> str:
         """Use high reasoning for complex tasks"""
-        original_level = self.config.reasoning_level
-        self.config.reasoning_level = reasoning_level
-        
         system_prompt = """You are an expert problem solver. Break down complex tasks into steps, 
         analyze each component carefully, and provide detailed reasoning for your approach."""
         
-        try:
-            result = self.chat(task, system_prompt)
-            return result
-        finally:
-            self.config.reasoning_level = original_level
+        return self.chat(task, system_prompt, reasoning_level=reasoning_level)
     
     def reset_conversation(self):
         """Reset the conversation history"""
-        self.conversation_history = []
+        self.conversation_history = collections.deque()
+        self.history_summary = None
+        self._dropped_summary = ConversationSummary()
 
 
 def check_docker_model_runner():